@@ -0,0 +1,82 @@
+"""
+/data latency while ABE crypto load runs alongside.
+
+Measures /data p50/p95/p99 first on its own, then while other clients hammer
+/abe/keygen, /abe/encrypt and /abe/decrypt. Run it against a server started
+with ABE_WORKERS=0 (inline RSA) and with ABE_WORKERS=2 (process pool) to
+compare.
+
+Start the server first (python run.py), then from the Framework folder:
+    python -m benchmarks.abe_contention --server http://127.0.0.1:5000
+"""
+import argparse
+import threading
+import time
+
+import requests
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def ingest_loop(server, stop, latencies):
+    session = requests.Session()
+    payload = {"patient_id": "bench_contention", "ecg": 512, "hr": 75, "spo2": 98, "temp": 36.5, "hum": 45.0}
+    while not stop.is_set():
+        start = time.perf_counter()
+        session.post(f"{server}/data", json=payload)
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.01)
+
+
+def abe_loop(server, stop, counter):
+    session = requests.Session()
+    user_key = session.post(f"{server}/abe/keygen",
+                            json={"username": "bench", "attributes": ["doctor", "cardiology"]}).json()["user_key"]
+    while not stop.is_set():
+        session.post(f"{server}/abe/keygen", json={"username": "bench", "attributes": ["doctor", "cardiology"]})
+        package = session.post(f"{server}/abe/encrypt",
+                               json={"message": "Patient has severe arrhythmia.", "policy": ["doctor"]}).json()
+        if package.get("ciphertext"):
+            session.post(f"{server}/abe/decrypt", json={"ciphertext": package["ciphertext"], "user_key": user_key})
+        counter.append(3)
+
+
+def measure(server, duration, ingest_threads, abe_threads):
+    stop = threading.Event()
+    latencies = []
+    abe_ops = []
+    threads = [threading.Thread(target=ingest_loop, args=(server, stop, latencies)) for _ in range(ingest_threads)]
+    threads += [threading.Thread(target=abe_loop, args=(server, stop, abe_ops)) for _ in range(abe_threads)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000.0,
+        "p95_ms": percentile(latencies, 0.95) * 1000.0,
+        "p99_ms": percentile(latencies, 0.99) * 1000.0,
+        "abe_ops_per_sec": sum(abe_ops) / duration
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', default="http://127.0.0.1:5000")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--ingest-threads', type=int, default=4)
+    parser.add_argument('--abe-threads', type=int, default=4)
+    args = parser.parse_args()
+
+    for label, abe_threads in (("ingest only", 0), ("with ABE load", args.abe_threads)):
+        r = measure(args.server, args.duration, args.ingest_threads, abe_threads)
+        print(f"{label:14s} /data p50 {r['p50_ms']:7.2f} ms  p95 {r['p95_ms']:7.2f} ms  p99 {r['p99_ms']:7.2f} ms  "
+              f"({r['requests']} requests, {r['abe_ops_per_sec']:.1f} ABE ops/s)")
@@ -0,0 +1,62 @@
+"""
+ABE encrypt/decrypt throughput: per-message RSA wrap vs session data keys.
+
+Uses a throwaway master key, so the real abe_master.pem is untouched.
+
+Run from the Framework folder:
+    python -m benchmarks.abe_throughput
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from dashboard.abe_engine import ABEEngine
+
+READING = json.dumps({"patient_id": "patient_alpha", "hr": 75, "spo2": 98, "temp": 36.5, "hum": 45.0})
+POLICY = ["doctor", "cardiology"]
+
+
+def rate(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return n / (time.perf_counter() - start)
+
+
+def run(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = ABEEngine(key_file=os.path.join(tmp, 'bench_master.pem'))
+        user_key = engine.keygen("bench", ["doctor", "cardiology"])
+
+        results = {}
+        for mode, session in (("per_message", False), ("session", True)):
+            encrypt_rate = rate(lambda: engine.encrypt(READING, POLICY, session=session), n)
+
+            packages = iter([engine.encrypt(READING, POLICY, session=session) for _ in range(n)])
+            # Start cold, so the first decrypt pays its RSA unwrap and key verification
+            engine._key_cache.clear()
+            engine._verified_keys.clear()
+            decrypt_rate = rate(lambda: engine.decrypt(next(packages), user_key), n)
+
+            # One verification for the whole chart
+            packages = [engine.encrypt(READING, POLICY, session=session) for _ in range(n)]
+            engine._key_cache.clear()
+            engine._verified_keys.clear()
+            start = time.perf_counter()
+            engine.decrypt_many(packages, user_key)
+            batch_rate = n / (time.perf_counter() - start)
+
+            results[mode] = {"encrypt_per_sec": encrypt_rate, "decrypt_per_sec": decrypt_rate,
+                             "decrypt_batch_per_sec": batch_rate}
+            print(f"{mode:12s} encrypt {encrypt_rate:9.1f} msg/s   "
+                  f"decrypt {decrypt_rate:9.1f} msg/s   decrypt_many {batch_rate:9.1f} msg/s")
+        return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', type=int, default=500, help="Messages per measurement")
+    args = parser.parse_args()
+    run(args.n)
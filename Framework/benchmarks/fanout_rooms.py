@@ -0,0 +1,91 @@
+"""
+Socket.IO fan-out load test.
+
+Publishes one reading per bed per round and measures what each connected
+client receives. With per-patient rooms, a client watching one patient should
+see the same egress whether the ward has 10 beds or 500. The nurse station
+receives coalesced frames at STATION_UPDATE_HZ regardless of the sensor rate.
+
+Run from the Framework folder:
+    python -m benchmarks.fanout_rooms
+"""
+import argparse
+import json
+import time
+
+from dashboard.app import app, socketio, create_tables, publish_reading, station as aggregator
+
+
+def connect(username, password):
+    http = app.test_client()
+    http.post('/login', data={'username': username, 'password': password})
+    return socketio.test_client(app, flask_test_client=http)
+
+
+def egress(client):
+    """Events and approximate bytes received since the last call."""
+    received = client.get_received()
+    return len(received), sum(len(json.dumps(r['args'])) for r in received)
+
+
+def run(bed_counts, watchers, rounds, interval):
+    create_tables()
+    results = []
+    for beds in bed_counts:
+        patients = [f"bed_{i:04d}" for i in range(beds)]
+
+        watcher_clients = []
+        for i in range(watchers):
+            client = connect('doctor', 'doctor123')
+            client.emit('subscribe', {"patient_id": patients[i % beds]}, callback=True)
+            client.get_received()
+            watcher_clients.append(client)
+
+        station = connect('nurse', 'nurse123')
+        station.emit('subscribe_ward', callback=True)
+        station.get_received()
+
+        publish_time = 0.0
+        start = time.perf_counter()
+        for r in range(rounds):
+            now = time.time()
+            t0 = time.perf_counter()
+            for pid in patients:
+                publish_reading(pid, {"patient_id": pid, "ecg": 512, "hr": 75, "spo2": 98, "temp": 36.5, "hum": 45.0}, now)
+            publish_time += time.perf_counter() - t0
+            time.sleep(interval)
+        # Let the last station tick go out
+        time.sleep(aggregator.interval * 1.5)
+        elapsed = time.perf_counter() - start
+
+        watcher_events, watcher_bytes = zip(*(egress(c) for c in watcher_clients))
+        station_events, station_bytes = egress(station)
+
+        result = {
+            "beds": beds,
+            "rounds": rounds,
+            "publish_ms_per_round": publish_time / rounds * 1000.0,
+            "watcher_events_per_round": sum(watcher_events) / len(watcher_clients) / rounds,
+            "watcher_bytes_per_round": sum(watcher_bytes) / len(watcher_clients) / rounds,
+            "station_frames_per_sec": station_events / elapsed,
+            "station_bytes_per_sec": station_bytes / elapsed
+        }
+        results.append(result)
+        print(f"beds={beds:5d}  watcher: {result['watcher_events_per_round']:.1f} ev/round "
+              f"{result['watcher_bytes_per_round']:.0f} B/round  |  station: "
+              f"{result['station_frames_per_sec']:.1f} frames/s {result['station_bytes_per_sec']:.0f} B/s  |  "
+              f"publish {result['publish_ms_per_round']:.2f} ms/round")
+
+        for client in watcher_clients + [station]:
+            client.disconnect()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--beds', type=int, nargs='+', default=[10, 50, 100, 250, 500])
+    parser.add_argument('--watchers', type=int, default=10, help="Clients each watching one patient")
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.1, help="Seconds between rounds (sensor period)")
+    args = parser.parse_args()
+    run(args.beds, args.watchers, args.rounds, args.interval)
@@ -1,21 +1,43 @@
 import json
 import base64
+import hashlib
 import os
+import threading
+import time
 from Crypto.PublicKey import RSA
 from Crypto.Cipher import AES, PKCS1_OAEP
 from Crypto.Random import get_random_bytes
 from Crypto.Hash import SHA256
 from Crypto.Signature import pkcs1_15
 
+from dashboard.cache import LRUCache
+from dashboard.abe_policy import compile_policy
+
 class ABEEngine:
-    def __init__(self):
+    def __init__(self, key_file="abe_master.pem", key_window=300, key_max_uses=100000,
+                 key_cache_size=4096, key_cache_ttl=900, verified_cache_size=1024):
         self.master_key_pair = None
         self.public_key = None
         
         # In a real system, these would be loaded from secure storage
         # For this simulation, we'll generate them if they don't exist in memory
         # or load from a file if we want persistence
-        self.key_file = "abe_master.pem"
+        self.key_file = key_file
+
+        # Session/data-key mode: one RSA-wrapped AES key per (policy, time window),
+        # reused with a fresh nonce per record. A key is rotated when its window
+        # ends or after `key_max_uses` messages, whichever comes first.
+        self.key_window = key_window
+        self.key_max_uses = key_max_uses
+        self._session_keys = {}
+        self._session_lock = threading.Lock()
+
+        # Unwrapped data keys, keyed by a digest of the wrapped key
+        self._key_cache = LRUCache(maxsize=key_cache_size, ttl=key_cache_ttl)
+
+        # User Keys whose signature already verified against the current master key
+        self._verified_keys = LRUCache(maxsize=verified_cache_size)
+
         self._load_or_generate_keys()
 
     def _load_or_generate_keys(self):
@@ -36,9 +58,25 @@ class ABEEngine:
         # Save to file for persistence across restarts
         with open(self.key_file, 'wb') as f:
             f.write(self.master_key_pair.export_key())
+
+        self._clear_caches()
             
         return "Setup Complete. Master Key Generated."
 
+    def reload(self):
+        """Re-reads the master key from key_file, e.g. after another process rotated it."""
+        with open(self.key_file, 'rb') as f:
+            self.master_key_pair = RSA.import_key(f.read())
+            self.public_key = self.master_key_pair.publickey()
+        self._clear_caches()
+
+    def _clear_caches(self):
+        # Keys wrapped or signed under the old master key are no longer valid
+        with self._session_lock:
+            self._session_keys.clear()
+        self._key_cache.clear()
+        self._verified_keys.clear()
+
     def keygen(self, username, attributes):
         """
         Generate a 'User Key' for a specific user.
@@ -67,10 +105,35 @@ class ABEEngine:
         
         return user_key
 
-    def encrypt(self, message, policy_attributes):
+    def _session_key(self, policy):
+        """
+        Returns (aes_key, enc_aes_key) for the current window of this policy,
+        wrapping a fresh key with RSA only when the window or use count rolls over.
+        """
+        window = int(time.time() // self.key_window)
+        with self._session_lock:
+            entry = self._session_keys.get(policy)
+            if entry is None or entry["window"] != window or entry["uses"] >= self.key_max_uses:
+                aes_key = get_random_bytes(16)
+                enc_aes_key = PKCS1_OAEP.new(self.public_key).encrypt(aes_key)
+                entry = self._session_keys[policy] = {
+                    "window": window, "uses": 0, "key": aes_key, "enc_key": enc_aes_key
+                }
+                # The encrypting side already knows the key; save the RSA unwrap on decrypt
+                self._key_cache.put(self._key_id(enc_aes_key), aes_key)
+            entry["uses"] += 1
+            return entry["key"], entry["enc_key"]
+
+    @staticmethod
+    def _key_id(enc_aes_key):
+        return hashlib.sha256(enc_aes_key).hexdigest()[:32]
+
+    def encrypt(self, message, policy_attributes, session=False):
         """
         Encrypts a message such that it can only be decrypted by a user
         who possesses ALL the attributes in `policy_attributes`.
+        `policy_attributes` may also be a policy string with AND/OR/threshold
+        gates, e.g. "(doctor AND cardiology) OR 2 of (nurse, icu, senior)".
         
         Mechanism:
         1. Encrypt message with a random AES Key.
@@ -90,10 +153,20 @@ class ABEEngine:
         To make it look like ABE:
         Input: Data, Policy
         Output: Ciphertext (contains {AES_Encrypted_Data, Policy})
+
+        With session=True the AES key is shared by all messages under the same
+        policy in the current key window (fresh nonce per message), so the RSA
+        wrap happens once per window instead of once per message.
         """
         
+        # Compiling validates the policy before anything is encrypted under it
+        policy = compile_policy(policy_attributes)
+
         # 1. Generate AES Key and Nonce
-        aes_key = get_random_bytes(16)
+        if session:
+            aes_key, enc_aes_key = self._session_key(policy.source)
+        else:
+            aes_key = get_random_bytes(16)
         cipher_aes = AES.new(aes_key, AES.MODE_EAX)
         ciphertext, tag = cipher_aes.encrypt_and_digest(message.encode('utf-8'))
         
@@ -102,49 +175,81 @@ class ABEEngine:
         # Here, we will encrypt the aes_key using the Master Public Key so only the Authority (us) can recover it
         # to perform the policy check during decryption phase.
         
-        cipher_rsa = PKCS1_OAEP.new(self.public_key)
-        enc_aes_key = cipher_rsa.encrypt(aes_key)
+        if not session:
+            cipher_rsa = PKCS1_OAEP.new(self.public_key)
+            enc_aes_key = cipher_rsa.encrypt(aes_key)
         
         package = {
-            "policy": sorted(policy_attributes),
+            "policy": policy.source if isinstance(policy_attributes, str) else sorted(policy_attributes),
             "ciphertext": base64.b64encode(ciphertext).decode('utf-8'),
             "nonce": base64.b64encode(cipher_aes.nonce).decode('utf-8'),
             "tag": base64.b64encode(tag).decode('utf-8'),
             "encrypted_key": base64.b64encode(enc_aes_key).decode('utf-8')
         }
+        if session:
+            package["key_id"] = self._key_id(enc_aes_key)
         
         return package
 
-    def decrypt(self, ciphertext_package, user_key):
+    def verify_user_key(self, user_key):
         """
-        Decrypts the package if the user_key's attributes satisfy the policy.
+        Checks the Master Key signature on a User Key and returns its attributes.
+        Keys that already verified are remembered (bounded LRU, keyed by a digest
+        of the signed data and signature), so a clinician decrypting many records
+        pays for one RSA verification.
         """
         # 1. Verify User Key Signature
         user_data = user_key['data']
         signature = base64.b64decode(user_key['signature'])
         
         user_data_json = json.dumps(user_data).encode('utf-8')
+        digest = hashlib.sha256(user_data_json + b'.' + signature).hexdigest()
+        if self._verified_keys.get(digest):
+            return set(user_data['attributes'])
+
         h = SHA256.new(user_data_json)
         
         try:
             pkcs1_15.new(self.public_key).verify(h, signature)
         except (ValueError, TypeError):
             raise Exception("Invalid User Key: Signature Verification Failed.")
-            
+
+        self._verified_keys.put(digest, True)
+        return set(user_data['attributes'])
+
+    def decrypt(self, ciphertext_package, user_key):
+        """
+        Decrypts the package if the user_key's attributes satisfy the policy.
+        """
+        user_attrs = self.verify_user_key(user_key)
+        return self._decrypt_for(ciphertext_package, user_attrs)
+
+    def decrypt_many(self, ciphertext_packages, user_key):
+        """
+        Verifies the User Key once, then decrypts each package.
+        Returns one {"status", "message"} result per package, in order.
+        """
+        user_attrs = self.verify_user_key(user_key)
+        results = []
+        for package in ciphertext_packages:
+            try:
+                results.append({"status": "success", "message": self._decrypt_for(package, user_attrs)})
+            except Exception as e:
+                results.append({"status": "error", "message": str(e)})
+        return results
+
+    def _decrypt_for(self, ciphertext_package, user_attrs):
         # 2. Check Policy
-        # AND Policy: User must have ALL attributes in the policy
+        # A list means AND: User must have ALL attributes in the policy.
+        # A string is a boolean policy; both are compiled once and cached.
         policy = ciphertext_package.get('policy', [])
-        user_attrs = set(user_data['attributes'])
-        
-        for req_attr in policy:
-            if req_attr not in user_attrs:
-                raise Exception(f"Access Denied: Missing attribute '{req_attr}'")
+        if policy:
+            compile_policy(policy).check(user_attrs)
                 
         # 3. Decrypt
         # Recover AES Key (Authority does this part)
         enc_aes_key = base64.b64decode(ciphertext_package['encrypted_key'])
-        cipher_rsa = PKCS1_OAEP.new(self.master_key_pair)
-        aes_key = cipher_rsa.decrypt(enc_aes_key)
+        aes_key = self._unwrap_key(enc_aes_key, cache='key_id' in ciphertext_package)
         
         # Decrypt Data
         nonce = base64.b64decode(ciphertext_package['nonce'])
@@ -156,5 +261,21 @@ class ABEEngine:
         
         return data.decode('utf-8')
 
+    def _unwrap_key(self, enc_aes_key, cache=False):
+        """
+        RSA-decrypts a wrapped AES key. Session keys are shared by many packages,
+        so they are cached (LRU + TTL) by a digest of the wrapped key itself,
+        never by a client-supplied id.
+        """
+        if not cache:
+            return PKCS1_OAEP.new(self.master_key_pair).decrypt(enc_aes_key)
+
+        key_id = self._key_id(enc_aes_key)
+        aes_key = self._key_cache.get(key_id)
+        if aes_key is None:
+            aes_key = PKCS1_OAEP.new(self.master_key_pair).decrypt(enc_aes_key)
+            self._key_cache.put(key_id, aes_key)
+        return aes_key
+
 # Singleton instance
 abe = ABEEngine()
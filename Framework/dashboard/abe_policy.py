@@ -0,0 +1,236 @@
+"""
+Boolean access policies for ABEEngine.
+
+    (doctor AND cardiology) OR 2 of (nurse, icu, senior)
+
+Policies are parsed once into a CompiledPolicy and cached by their source, so
+records sharing a policy only pay for a bitmask check against the user's
+attributes. A plain list of attributes is the legacy form and means AND.
+"""
+import re
+import threading
+
+from dashboard.cache import LRUCache
+
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|(,)|([A-Za-z_][\w\-.:]*)|(\d+))')
+_KEYWORDS = ('and', 'or', 'of')
+
+
+class PolicyError(Exception):
+    pass
+
+
+class AttributeIndex:
+    """Interns attribute names to bit positions so sets become int bitmasks."""
+    def __init__(self):
+        self._bits = {}
+        self._lock = threading.Lock()
+        self._masks = LRUCache(maxsize=4096)
+
+    def bit(self, name):
+        bit = self._bits.get(name)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.setdefault(name, 1 << len(self._bits))
+        return bit
+
+    def mask(self, attributes):
+        key = frozenset(attributes)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = 0
+            for name in key:
+                mask |= self.bit(name)
+            self._masks.put(key, mask)
+        return mask
+
+
+attribute_index = AttributeIndex()
+
+
+# --- Parsing ---
+
+def _tokenize(source):
+    tokens = []
+    pos = 0
+    source = source.rstrip()
+    while pos < len(source):
+        m = _TOKEN.match(source, pos)
+        if not m:
+            raise PolicyError(f"Unexpected character at {pos} in policy '{source}'")
+        lparen, rparen, comma, word, number = m.groups()
+        if word and word.lower() in _KEYWORDS:
+            tokens.append(('kw', word.lower()))
+        elif word:
+            tokens.append(('attr', word))
+        elif number:
+            tokens.append(('num', int(number)))
+        else:
+            tokens.append(('sym', lparen or rparen or comma))
+        pos = m.end()
+    return tokens
+
+
+class _Parser:
+    """
+    expr      := term ('or' term)*
+    term      := factor ('and' factor)*
+    factor    := '(' expr ')' | NUMBER 'of' '(' expr (',' expr)* ')' | ATTR
+    """
+    def __init__(self, source):
+        self.source = source
+        self.tokens = _tokenize(source)
+        self.pos = 0
+
+    def parse(self):
+        if not self.tokens:
+            raise PolicyError("Empty policy")
+        node = self._expr()
+        if self.pos != len(self.tokens):
+            raise PolicyError(f"Unexpected '{self.tokens[self.pos][1]}' in policy '{self.source}'")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _expect(self, kind, value=None):
+        tok = self._peek()
+        if tok[0] != kind or (value is not None and tok[1] != value):
+            raise PolicyError(f"Expected '{value or kind}' in policy '{self.source}'")
+        self.pos += 1
+        return tok[1]
+
+    def _expr(self):
+        children = [self._term()]
+        while self._peek() == ('kw', 'or'):
+            self.pos += 1
+            children.append(self._term())
+        return children[0] if len(children) == 1 else ('or', children)
+
+    def _term(self):
+        children = [self._factor()]
+        while self._peek() == ('kw', 'and'):
+            self.pos += 1
+            children.append(self._factor())
+        return children[0] if len(children) == 1 else ('and', children)
+
+    def _factor(self):
+        kind, value = self._peek()
+        if (kind, value) == ('sym', '('):
+            self.pos += 1
+            node = self._expr()
+            self._expect('sym', ')')
+            return node
+        if kind == 'num':
+            self.pos += 1
+            self._expect('kw', 'of')
+            self._expect('sym', '(')
+            children = [self._expr()]
+            while self._peek() == ('sym', ','):
+                self.pos += 1
+                children.append(self._expr())
+            self._expect('sym', ')')
+            if not 1 <= value <= len(children):
+                raise PolicyError(f"Threshold {value} of {len(children)} is out of range in policy '{self.source}'")
+            return ('of', value, children)
+        if kind == 'attr':
+            self.pos += 1
+            return ('attr', value)
+        raise PolicyError(f"Expected attribute in policy '{self.source}'")
+
+
+# --- Compilation ---
+
+def _compile(node, index):
+    """Turns a parse tree into a predicate over an attribute bitmask."""
+    kind = node[0]
+    if kind == 'attr':
+        bit = index.bit(node[1])
+        return lambda mask: (mask & bit) != 0
+
+    children = node[2] if kind == 'of' else node[1]
+    # Leaf attributes of a gate collapse into one mask; only nested gates stay as calls
+    leaf_mask = 0
+    nested = []
+    for child in children:
+        if child[0] == 'attr':
+            leaf_mask |= index.bit(child[1])
+        else:
+            nested.append(_compile(child, index))
+
+    if kind == 'and':
+        if not nested:
+            return lambda mask: (mask & leaf_mask) == leaf_mask
+        return lambda mask: (mask & leaf_mask) == leaf_mask and all(f(mask) for f in nested)
+    if kind == 'or':
+        if not nested:
+            return lambda mask: (mask & leaf_mask) != 0
+        return lambda mask: (mask & leaf_mask) != 0 or any(f(mask) for f in nested)
+
+    threshold = node[1]
+    return lambda mask: bin(mask & leaf_mask).count('1') + sum(1 for f in nested if f(mask)) >= threshold
+
+
+def _attributes(node):
+    if node[0] == 'attr':
+        return {node[1]}
+    children = node[2] if node[0] == 'of' else node[1]
+    return set().union(*(_attributes(c) for c in children))
+
+
+class CompiledPolicy:
+    def __init__(self, source, tree, index=attribute_index):
+        self.source = source
+        self.attributes = frozenset(_attributes(tree))
+        # A pure AND of attributes can say which attribute is missing
+        self.required = sorted(self.attributes) if tree[0] == 'attr' or (
+            tree[0] == 'and' and all(c[0] == 'attr' for c in tree[1])) else None
+        self._index = index
+        self._check = _compile(tree, index)
+
+    def satisfied_by(self, attributes):
+        """`attributes` is an iterable of names or a mask from AttributeIndex.mask."""
+        mask = attributes if isinstance(attributes, int) else self._index.mask(attributes)
+        return self._check(mask)
+
+    def check(self, attributes):
+        """Raises if the attributes do not satisfy the policy."""
+        if self.satisfied_by(attributes):
+            return
+        if self.required is not None and not isinstance(attributes, int):
+            for attr in self.required:
+                if attr not in attributes:
+                    raise Exception(f"Access Denied: Missing attribute '{attr}'")
+        raise Exception(f"Access Denied: Policy '{self.source}' not satisfied")
+
+    def __repr__(self):
+        return f"CompiledPolicy({self.source!r})"
+
+
+_policy_cache = LRUCache(maxsize=1024)
+
+
+def compile_policy(policy):
+    """
+    Compiles a policy string, or a list of attributes meaning AND, into a
+    CompiledPolicy. Results are cached by policy.
+    """
+    if isinstance(policy, (list, tuple)):
+        if not policy:
+            raise PolicyError("Empty policy")
+        key = tuple(sorted(policy))
+        source = ' AND '.join(key)
+    elif isinstance(policy, str):
+        key = source = policy.strip()
+    else:
+        raise PolicyError("Policy must be a string or a list of attributes")
+
+    compiled = _policy_cache.get(key)
+    if compiled is None:
+        if isinstance(key, tuple):
+            tree = ('and', [('attr', a) for a in key]) if len(key) > 1 else ('attr', key[0])
+        else:
+            tree = _Parser(source).parse()
+        compiled = CompiledPolicy(source, tree)
+        _policy_cache.put(key, compiled)
+    return compiled
@@ -1,9 +1,16 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from dashboard.models import db, User, HealthRecord
+from dashboard.models import db, User, HealthRecord, EcgChunk
+from dashboard.ingest import GroupCommitWriter, parse_readings, health_record_row, has_vitals
+from dashboard.ecg_store import EcgChunker, VitalsSampler
+from dashboard.history import patient_history, parse_range
+from dashboard.station import StationAggregator
+from dashboard.abe_policy import PolicyError
+import atexit
 import time
 import os
+from datetime import datetime
 
 import sys
 import os
@@ -26,7 +33,45 @@ db_path = os.path.join(base_dir, 'health.db')
 app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Group commit: flush ingested rows every N ms or M rows, whichever comes first
+app.config['INGEST_FLUSH_INTERVAL_MS'] = 50
+app.config['INGEST_MAX_BATCH_ROWS'] = 500
+app.config['INGEST_COMMIT_TIMEOUT'] = 5.0
+
+# ECG is stored in fixed-length blocks; vitals are kept at a lower rate
+app.config['ECG_CHUNK_SAMPLES'] = 256
+app.config['ECG_CHUNK_MAX_AGE'] = 2.0
+app.config['VITALS_INTERVAL'] = 1.0
+
+# Nurse station summary frames per second
+app.config['STATION_UPDATE_HZ'] = 2.0
+
+# Device channel (/device namespace): frames a device may have in flight,
+# and writer queue depth above which frames are refused with a retry hint
+app.config['DEVICE_WINDOW'] = 8
+app.config['DEVICE_MAX_QUEUE_DEPTH'] = 1000
+
 db.init_app(app)
+writer = GroupCommitWriter(
+    app,
+    flush_interval_ms=app.config['INGEST_FLUSH_INTERVAL_MS'],
+    max_rows=app.config['INGEST_MAX_BATCH_ROWS']
+)
+ecg_chunker = EcgChunker(
+    chunk_size=app.config['ECG_CHUNK_SAMPLES'],
+    max_age=app.config['ECG_CHUNK_MAX_AGE']
+)
+vitals_sampler = VitalsSampler(interval=app.config['VITALS_INTERVAL'])
+
+@atexit.register
+def flush_ecg_blocks():
+    # Persist partially filled ECG blocks on shutdown
+    rows = ecg_chunker.flush_all()
+    if rows:
+        try:
+            writer.submit(rows, table=EcgChunk.__table__).wait(app.config['INGEST_COMMIT_TIMEOUT'])
+        except Exception as e:
+            print(f"Error flushing ECG blocks: {e}")
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -129,47 +174,202 @@ def monitor_patient(patient_id):
         return render_template('dashboard_patient.html', patient_id=patient_id)
     return "Access Denied", 403
 
+def can_view_patient(patient_id):
+    # Doctors and Nurses can view any patient, patients only themselves
+    if current_user.role in ['doctor', 'nurse']:
+        return True
+    return current_user.role == 'patient' and current_user.username == patient_id
+
+# --- Socket.IO Subscriptions ---
+# Each patient has a room; the nurse station listens on the ward room.
+# Samples are only sent to the rooms that asked for them.
+
+WARD_ROOM = 'ward'
+station = StationAggregator(socketio, WARD_ROOM, rate_hz=app.config['STATION_UPDATE_HZ'])
+
+def patient_room(patient_id):
+    return f'patient:{patient_id}'
+
+@socketio.on('connect')
+def on_connect():
+    if not current_user.is_authenticated:
+        return False
+
+@socketio.on('subscribe')
+def on_subscribe(msg):
+    patient_id = (msg or {}).get('patient_id')
+    if not patient_id or not can_view_patient(patient_id):
+        return {"status": "error", "message": "Access Denied"}
+    join_room(patient_room(patient_id))
+    return {"status": "success", "room": patient_room(patient_id)}
+
+@socketio.on('unsubscribe')
+def on_unsubscribe(msg):
+    patient_id = (msg or {}).get('patient_id')
+    if patient_id:
+        leave_room(patient_room(patient_id))
+    return {"status": "success"}
+
+@socketio.on('subscribe_ward')
+def on_subscribe_ward():
+    if current_user.role not in ['doctor', 'nurse']:
+        return {"status": "error", "message": "Access Denied"}
+    join_room(WARD_ROOM)
+    # Deltas only carry changed patients, so start the station off with the full ward
+    emit('station_update', station.snapshot())
+    return {"status": "success", "room": WARD_ROOM}
+
+@socketio.on('unsubscribe_ward')
+def on_unsubscribe_ward():
+    leave_room(WARD_ROOM)
+    return {"status": "success"}
+
+# --- History ---
+
+@app.route('/api/history/<patient_id>')
+@login_required
+def history(patient_id):
+    if not can_view_patient(patient_id): return "Access Denied", 403
+    try:
+        # ?start=&end= (epoch seconds, default last hour), ?points= buckets, ?ecg=0 to skip waveform
+        start, end = parse_range(request.args)
+        points = int(request.args.get('points', 500))
+        include_ecg = request.args.get('ecg', '1') != '0'
+        return jsonify(patient_history(patient_id, start, end, points, include_ecg)), 200
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
 # --- Data Ingestion ---
 
+def ingest_readings(readings):
+    """
+    Queues readings for the group-commit writer, waits until they are durable,
+    then pushes them to connected dashboards.
+    """
+    now = datetime.utcnow()
+    vitals_rows = []
+    ecg_rows = []
+    for r in readings:
+        patient_id = r.get('patient_id', 'unknown')
+        ecg_rows.extend(ecg_chunker.add(patient_id, r.get('ecg'), now))
+        if has_vitals(r) and vitals_sampler.accept(patient_id, now):
+            vitals_rows.append(health_record_row(r, now))
+    ecg_rows.extend(ecg_chunker.collect_stale(now))
+
+    tickets = []
+    if vitals_rows:
+        tickets.append(writer.submit(vitals_rows))
+    if ecg_rows:
+        tickets.append(writer.submit(ecg_rows, table=EcgChunk.__table__))
+    for ticket in tickets:
+        ticket.wait(app.config['INGEST_COMMIT_TIMEOUT'])
+
+    last_seen = time.time()
+    for data in readings:
+        publish_reading(data.get('patient_id', 'unknown'), data, last_seen)
+
+def publish_reading(patient_id, data, last_seen):
+    # Real-time emit, only to clients watching this patient
+    socketio.emit('sensor_update', {"patient_id": patient_id, "data": data}, to=patient_room(patient_id))
+
+    # Nurse station gets coalesced ward frames at STATION_UPDATE_HZ
+    station.update(patient_id, data, last_seen)
+
 @app.route('/data', methods=['POST'])
 def receive_data():
     try:
         data = request.json
         if not data: return jsonify({"status": "error"}), 400
-        
-        patient_id = data.get('patient_id', 'unknown')
-        
-        # Save to DB
-        record = HealthRecord(
-            patient_id=patient_id,
-            hr=data.get('hr'),
-            spo2=data.get('spo2'),
-            temp=data.get('temp'),
-            hum=data.get('hum'),
-            ecg_data=data.get('ecg')
-        )
-        db.session.add(record)
-        db.session.commit()
-        
-        # Real-time emit
-        socketio.emit('sensor_update', {"patient_id": patient_id, "data": data})
-        
-        # Update nurse station list (simplified for now, just trigger refresh)
-        socketio.emit('station_update', {"patient_id": patient_id, "data": data, "last_seen": time.time()})
-        
+
+        ingest_readings([data])
+
         return jsonify({"status": "success"}), 200
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/data/batch', methods=['POST'])
+def receive_data_batch():
+    try:
+        # Expects a JSON array of readings, {"readings": [...]} or NDJSON
+        readings = parse_readings(request.get_data(as_text=True), request.mimetype)
+        if not readings: return jsonify({"status": "error", "message": "No readings"}), 400
+
+        ingest_readings(readings)
+
+        return jsonify({"status": "success", "accepted": len(readings)}), 200
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# --- Device Channel ---
+# Long-lived Socket.IO connection for devices on the /device namespace.
+# Devices send frames {"seq": n, "readings": [...]} and wait for the ack before
+# reusing a window slot. The ack carries the credit (frames allowed in flight),
+# which shrinks as the writer backs up; "busy" means resend after retry_after.
+
+DEVICE_NAMESPACE = '/device'
+
+@socketio.on('connect', namespace=DEVICE_NAMESPACE)
+def on_device_connect():
+    emit('credit', {"credit": app.config['DEVICE_WINDOW']})
+
+@socketio.on('readings', namespace=DEVICE_NAMESPACE)
+def on_device_readings(msg):
+    seq = (msg or {}).get('seq')
+    readings = (msg or {}).get('readings') or []
+    if not isinstance(readings, list) or not readings:
+        return {"status": "error", "seq": seq, "message": "No readings"}
+
+    depth = writer.queue_depth()
+    max_depth = app.config['DEVICE_MAX_QUEUE_DEPTH']
+    if depth >= max_depth:
+        return {"status": "busy", "seq": seq, "retry_after": writer.flush_interval * 2, "credit": 1}
+
+    try:
+        ingest_readings(readings)
+    except Exception as e:
+        print(f"Error: {e}")
+        return {"status": "error", "seq": seq, "message": str(e)}
+
+    # Scale the window down linearly as the writer queue fills
+    credit = max(1, int(app.config['DEVICE_WINDOW'] * (1 - depth / max_depth)))
+    return {"status": "success", "seq": seq, "accepted": len(readings), "credit": credit}
+
+@app.route('/data/stats')
+def ingest_stats():
+    # Rows/sec and commit latency, for sizing wards against the writer
+    return jsonify(writer.stats()), 200
+
 # --- ABE APIs ---
-from dashboard.abe_engine import abe
+from dashboard.abe_engine import abe as abe_engine
+from dashboard.crypto_pool import CryptoPool, CryptoBusy
+
+# RSA work runs in worker processes so it does not stall ingest and socket fan-out.
+# ABE_WORKERS=0 keeps it inline on the request thread.
+app.config['ABE_WORKERS'] = int(os.environ.get('ABE_WORKERS', 2))
+app.config['ABE_MAX_PENDING'] = 64
+app.config['ABE_TIMEOUT'] = 10.0
+
+if app.config['ABE_WORKERS'] > 0:
+    abe = CryptoPool(
+        abe_engine,
+        workers=app.config['ABE_WORKERS'],
+        max_pending=app.config['ABE_MAX_PENDING'],
+        timeout=app.config['ABE_TIMEOUT']
+    )
+else:
+    abe = abe_engine
 
 @app.route('/abe/setup', methods=['POST'])
 def abe_setup():
     try:
         msg = abe.setup()
         return jsonify({"status": "success", "message": msg}), 200
+    except CryptoBusy as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
@@ -186,13 +386,17 @@ def abe_keygen():
             
         user_key = abe.keygen(username, attributes)
         return jsonify({"status": "success", "user_key": user_key}), 200
+    except CryptoBusy as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 @app.route('/abe/encrypt', methods=['POST'])
 def abe_encrypt():
     try:
-        # Expects: {"message": "secret data", "policy": ["doctor", "cardiology"]}
+        # Expects: {"message": "secret data", "policy": ["doctor", "cardiology"], "session": false}
+        # policy may also be a string: "(doctor AND cardiology) OR 2 of (nurse, icu, senior)"
+        # session=true reuses the policy's data key for the current key window
         data = request.json
         message = data.get('message')
         policy = data.get('policy')
@@ -200,8 +404,12 @@ def abe_encrypt():
         if not message or not policy:
             return jsonify({"status": "error", "message": "Missing message or policy"}), 400
             
-        ciphertext_package = abe.encrypt(message, policy)
+        ciphertext_package = abe.encrypt(message, policy, session=bool(data.get('session')))
         return jsonify({"status": "success", "ciphertext": ciphertext_package}), 200
+    except PolicyError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except CryptoBusy as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
@@ -218,6 +426,27 @@ def abe_decrypt():
             
         decrypted_message = abe.decrypt(ciphertext, user_key)
         return jsonify({"status": "success", "message": decrypted_message}), 200
+    except CryptoBusy as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/abe/decrypt/batch', methods=['POST'])
+def abe_decrypt_batch():
+    try:
+        # Expects: {"ciphertexts": [{...}, ...], "user_key": {...}}
+        # The user key is verified once for the whole batch
+        data = request.json
+        ciphertexts = data.get('ciphertexts')
+        user_key = data.get('user_key')
+        
+        if not ciphertexts or not user_key:
+            return jsonify({"status": "error", "message": "Missing ciphertexts or user_key"}), 400
+            
+        results = abe.decrypt_many(ciphertexts, user_key)
+        return jsonify({"status": "success", "results": results}), 200
+    except CryptoBusy as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
@@ -225,6 +454,10 @@ def abe_decrypt():
 def create_tables():
     with app.app_context():
         db.create_all()
+        # create_all skips tables that already exist, so add any new indexes explicitly
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
         # Create default users if not exist
         if not User.query.filter_by(username='doctor').first():
             u = User(username='doctor', role='doctor')
@@ -0,0 +1,109 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from dashboard.abe_engine import ABEEngine
+
+# --- Worker side ---
+# Each worker process loads the master key once and keeps its own ABEEngine
+# (with its own session-key and verified-key caches) for its lifetime.
+
+_engine = None
+
+def _init_worker(key_file):
+    global _engine
+    _engine = ABEEngine(key_file=key_file)
+
+def _call(method, args, kwargs):
+    return getattr(_engine, method)(*args, **kwargs)
+
+def _setup():
+    _engine.setup()
+    return True
+
+
+class CryptoBusy(Exception):
+    """Raised when the crypto queue is full; the caller should retry later."""
+    pass
+
+
+class CryptoPool:
+    """
+    Runs ABEEngine operations in worker processes so RSA work does not hold the
+    GIL of the Flask/Socket.IO server. Exposes the same methods as ABEEngine.
+
+    At most `max_pending` operations are queued or running; beyond that calls
+    fail fast with CryptoBusy. Each call waits at most `timeout` seconds.
+    """
+    def __init__(self, engine, workers=2, max_pending=64, timeout=10.0):
+        self.engine = engine
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending
+
+        self._pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def key_file(self):
+        return self.engine.key_file
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=(self.engine.key_file,)
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise CryptoBusy("Crypto queue is full, retry later")
+            self._pending += 1
+        try:
+            future = self._pool().submit(fn, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                future.cancel()
+                raise TimeoutError(f"Crypto operation timed out after {self.timeout}s")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def pending(self):
+        return self._pending
+
+    def keygen(self, username, attributes):
+        return self._run(_call, 'keygen', (username, attributes), {})
+
+    def encrypt(self, message, policy_attributes, session=False):
+        return self._run(_call, 'encrypt', (message, policy_attributes), {"session": session})
+
+    def decrypt(self, ciphertext_package, user_key):
+        return self._run(_call, 'decrypt', (ciphertext_package, user_key), {})
+
+    def decrypt_many(self, ciphertext_packages, user_key):
+        return self._run(_call, 'decrypt_many', (ciphertext_packages, user_key), {})
+
+    def setup(self):
+        """
+        Generates the new master key in a worker (off the request thread), then
+        replaces the pool so every worker loads the new key and drops its caches.
+        """
+        self._run(_setup)
+        self.engine.reload()
+        with self._lock:
+            old, self._executor = self._executor, None
+        if old is not None:
+            old.shutdown(wait=False)
+        return "Setup Complete. Master Key Generated."
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
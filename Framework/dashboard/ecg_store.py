@@ -0,0 +1,159 @@
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+
+ENCODING = 'delta-varint'
+
+
+def encode_samples(samples):
+    """
+    Delta + zigzag varint encoding.
+    Neighbouring ECG samples differ by a few ADC counts, so most samples take 1 byte.
+    """
+    out = bytearray()
+    prev = 0
+    for s in samples:
+        delta = int(s) - prev
+        prev = int(s)
+        z = (delta << 1) ^ (delta >> 63)  # zigzag: small negatives -> small positives
+        while z >= 0x80:
+            out.append((z & 0x7F) | 0x80)
+            z >>= 7
+        out.append(z)
+    return bytes(out)
+
+
+def decode_samples(payload):
+    """Inverse of encode_samples. Returns an array('i')."""
+    samples = array('i')
+    prev = 0
+    z = 0
+    shift = 0
+    for b in payload:
+        z |= (b & 0x7F) << shift
+        if b & 0x80:
+            shift += 7
+            continue
+        prev += (z >> 1) ^ -(z & 1)
+        samples.append(prev)
+        z = 0
+        shift = 0
+    return samples
+
+
+def chunk_times(chunk):
+    """Evenly spreads a chunk's samples between its start and end time (epoch seconds)."""
+    start = (chunk.start_time - datetime(1970, 1, 1)).total_seconds()
+    end = (chunk.end_time - datetime(1970, 1, 1)).total_seconds()
+    n = chunk.n_samples
+    step = (end - start) / (n - 1) if n > 1 else 0.0
+    return [start + i * step for i in range(n)]
+
+
+class _Block:
+    __slots__ = ('samples', 'start_time', 'end_time')
+
+    def __init__(self, received_at):
+        self.samples = array('i')
+        self.start_time = received_at
+        self.end_time = received_at
+
+
+class EcgChunker:
+    """
+    Accumulates per-patient ECG samples into fixed-length blocks.
+    A block is handed to the writer once it holds `chunk_size` samples, or once it
+    is older than `max_age` seconds so a slow or idle device still gets persisted.
+    """
+    def __init__(self, chunk_size=256, max_age=2.0):
+        self.chunk_size = chunk_size
+        self.max_age = timedelta(seconds=max_age)
+        self._blocks = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def add(self, patient_id, samples, received_at):
+        """
+        Appends samples (an int or a list of ints) for a patient.
+        Returns EcgChunk insert rows for every block that filled up.
+        """
+        if samples is None:
+            return []
+        if not isinstance(samples, (list, tuple, array)):
+            samples = [samples]
+
+        rows = []
+        with self._lock:
+            block = self._blocks.get(patient_id)
+            if block is None:
+                block = self._blocks[patient_id] = _Block(received_at)
+
+            for s in samples:
+                block.samples.append(int(s))
+                if len(block.samples) >= self.chunk_size:
+                    block.end_time = received_at
+                    rows.append(self._row(patient_id, block))
+                    block = self._blocks[patient_id] = _Block(received_at)
+            block.end_time = received_at
+
+            if not block.samples:
+                del self._blocks[patient_id]
+        return rows
+
+    def collect_stale(self, now, min_interval=1.0):
+        """
+        Flushes partial blocks older than max_age.
+        Cheap to call on every request: it only sweeps once per `min_interval` seconds.
+        """
+        mono = time.monotonic()
+        if mono - self._last_sweep < min_interval:
+            return []
+        self._last_sweep = mono
+
+        rows = []
+        with self._lock:
+            for patient_id in list(self._blocks):
+                block = self._blocks[patient_id]
+                if now - block.start_time >= self.max_age:
+                    rows.append(self._row(patient_id, block))
+                    del self._blocks[patient_id]
+        return rows
+
+    def flush_all(self):
+        with self._lock:
+            rows = [self._row(pid, block) for pid, block in self._blocks.items()]
+            self._blocks.clear()
+        return rows
+
+    def _row(self, patient_id, block):
+        return {
+            "patient_id": patient_id,
+            "start_time": block.start_time,
+            "end_time": block.end_time,
+            "n_samples": len(block.samples),
+            "encoding": ENCODING,
+            "samples": encode_samples(block.samples),
+            "sample_min": min(block.samples),
+            "sample_max": max(block.samples)
+        }
+
+
+class VitalsSampler:
+    """
+    Vitals change slowly compared to the ECG, so only one HealthRecord row per
+    patient is kept every `interval` seconds; the rest are dropped before the DB.
+    """
+    def __init__(self, interval=1.0):
+        self.interval = timedelta(seconds=interval)
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def accept(self, patient_id, received_at):
+        with self._lock:
+            last = self._last.get(patient_id)
+            if last is not None and received_at - last < self.interval:
+                return False
+            self._last[patient_id] = received_at
+            return True
+
@@ -0,0 +1,133 @@
+import math
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, cast, Integer
+
+from dashboard.models import db, HealthRecord, EcgChunk
+from dashboard.ecg_store import decode_samples, chunk_times
+
+EPOCH = datetime(1970, 1, 1)
+VITALS = ('hr', 'spo2', 'temp', 'hum')
+
+MAX_POINTS = 5000
+
+
+def to_datetime(epoch_seconds):
+    return EPOCH + timedelta(seconds=epoch_seconds)
+
+
+def to_epoch(dt):
+    return (dt - EPOCH).total_seconds()
+
+
+def epoch_expr(column):
+    """SQL expression for a DateTime column as (fractional) epoch seconds."""
+    if db.engine.dialect.name == 'sqlite':
+        return (func.julianday(column) - 2440587.5) * 86400.0
+    return func.extract('epoch', column)
+
+
+def bucket_size(start, end, points):
+    """Seconds per bucket so that [start, end) fits in at most `points` buckets."""
+    points = max(1, min(int(points), MAX_POINTS))
+    return max((end - start) / points, 0.001)
+
+
+def vitals_history(patient_id, start, end, bucket_seconds):
+    """
+    Min/max/mean of each vital per time bucket, aggregated in SQL.
+    Only one row per bucket crosses into Python, whatever the raw row count.
+    """
+    bucket = cast((epoch_expr(HealthRecord.timestamp) - start) / bucket_seconds, Integer)
+    columns = [bucket.label('bucket'), func.count(HealthRecord.id)]
+    for name in VITALS:
+        col = getattr(HealthRecord, name)
+        columns += [func.min(col), func.max(col), func.avg(col)]
+
+    rows = (db.session.query(*columns)
+            .filter(HealthRecord.patient_id == patient_id,
+                    HealthRecord.timestamp >= to_datetime(start),
+                    HealthRecord.timestamp < to_datetime(end))
+            .group_by('bucket')
+            .order_by('bucket')
+            .all())
+
+    result = []
+    for row in rows:
+        point = {"t": start + row[0] * bucket_seconds, "n": row[1]}
+        for i, name in enumerate(VITALS):
+            lo, hi, mean = row[2 + i * 3: 5 + i * 3]
+            point[name] = None if mean is None else {"min": lo, "max": hi, "mean": round(mean, 2)}
+        result.append(point)
+    return result
+
+
+def ecg_history(patient_id, start, end, bucket_seconds):
+    """
+    Min-max decimated ECG envelope per time bucket.
+    When buckets are wider than a block, the stored block envelope is aggregated
+    in SQL; only fine-grained views decode the samples themselves.
+    """
+    span = (db.session.query(func.avg(epoch_expr(EcgChunk.end_time) - epoch_expr(EcgChunk.start_time)))
+            .filter(EcgChunk.patient_id == patient_id,
+                    EcgChunk.start_time >= to_datetime(start),
+                    EcgChunk.start_time < to_datetime(end))
+            .scalar())
+
+    if span is not None and bucket_seconds >= span:
+        bucket = cast((epoch_expr(EcgChunk.start_time) - start) / bucket_seconds, Integer)
+        rows = (db.session.query(bucket.label('bucket'), func.min(EcgChunk.sample_min), func.max(EcgChunk.sample_max))
+                .filter(EcgChunk.patient_id == patient_id,
+                        EcgChunk.start_time >= to_datetime(start),
+                        EcgChunk.start_time < to_datetime(end))
+                .group_by('bucket')
+                .order_by('bucket')
+                .all())
+        return [{"t": start + b * bucket_seconds, "min": lo, "max": hi} for b, lo, hi in rows]
+
+    chunks = (EcgChunk.query
+              .filter(EcgChunk.patient_id == patient_id,
+                      EcgChunk.end_time >= to_datetime(start),
+                      EcgChunk.start_time < to_datetime(end))
+              .order_by(EcgChunk.start_time)
+              .yield_per(256))
+
+    buckets = {}
+    for chunk in chunks:
+        samples = decode_samples(chunk.samples)
+        for t, v in zip(chunk_times(chunk), samples):
+            if t < start or t >= end:
+                continue
+            b = int((t - start) / bucket_seconds)
+            lo_hi = buckets.get(b)
+            if lo_hi is None:
+                buckets[b] = [v, v]
+            elif v < lo_hi[0]:
+                lo_hi[0] = v
+            elif v > lo_hi[1]:
+                lo_hi[1] = v
+    return [{"t": start + b * bucket_seconds, "min": lo, "max": hi} for b, (lo, hi) in sorted(buckets.items())]
+
+
+def patient_history(patient_id, start, end, points=500, include_ecg=True):
+    bucket_seconds = bucket_size(start, end, points)
+    result = {
+        "patient_id": patient_id,
+        "start": start,
+        "end": end,
+        "bucket_seconds": bucket_seconds,
+        "vitals": vitals_history(patient_id, start, end, bucket_seconds)
+    }
+    if include_ecg:
+        result["ecg"] = ecg_history(patient_id, start, end, bucket_seconds)
+    return result
+
+
+def parse_range(args, default_window=3600.0, now=None):
+    """Reads start/end (epoch seconds) from query args, defaulting to the last hour."""
+    now = to_epoch(datetime.utcnow()) if now is None else now
+    end = float(args.get('end', now))
+    start = float(args.get('start', end - default_window))
+    if not math.isfinite(start) or not math.isfinite(end) or start >= end:
+        raise ValueError("Invalid time range")
+    return start, end
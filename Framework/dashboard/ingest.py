@@ -0,0 +1,190 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from dashboard.models import db, HealthRecord
+
+
+def parse_readings(body, content_type):
+    """
+    Parses a batch body into a list of reading dicts.
+    Accepts a JSON array, {"readings": [...]} or NDJSON (one reading per line).
+    """
+    if content_type in ('application/x-ndjson', 'application/jsonl'):
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+
+    data = json.loads(body)
+    if isinstance(data, dict):
+        data = data.get('readings', [])
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of readings")
+    return data
+
+
+def health_record_row(reading, received_at=None):
+    """
+    Maps a device reading onto a HealthRecord (vitals) insert row.
+    The timestamp is taken at arrival, not at commit, so batching does not skew it.
+    The ECG waveform is stored separately in EcgChunk blocks.
+    """
+    return {
+        "patient_id": reading.get('patient_id', 'unknown'),
+        "timestamp": received_at or datetime.utcnow(),
+        "hr": reading.get('hr'),
+        "spo2": reading.get('spo2'),
+        "temp": reading.get('temp'),
+        "hum": reading.get('hum')
+    }
+
+
+def has_vitals(reading):
+    return any(reading.get(k) is not None for k in ('hr', 'spo2', 'temp', 'hum'))
+
+
+class _Ticket:
+    """Handed back to the submitter; set once the rows are committed (or failed)."""
+    def __init__(self, table, rows):
+        self.table = table
+        self.rows = rows
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Timed out waiting for group commit")
+        if self.error is not None:
+            raise self.error
+
+
+class GroupCommitWriter:
+    """
+    Gathers inserts from many request threads and writes them in one transaction
+    every `flush_interval_ms` or `max_rows`, whichever comes first.
+    SQLite pays one fsync per commit, so this turns N commits into 1.
+    """
+    def __init__(self, app, flush_interval_ms=50, max_rows=500, stats_window=10.0):
+        self.app = app
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_rows = max_rows
+        self.stats_window = stats_window
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        # Stats
+        self._stats_lock = threading.Lock()
+        self._commits = deque()  # (commit_time, rows, latency)
+        self.total_rows = 0
+        self.total_commits = 0
+        self.total_errors = 0
+        self.max_commit_latency = 0.0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, rows, table=None):
+        """
+        Queues rows for the next group commit and returns a ticket.
+        Call ticket.wait() to block until they are durable.
+        """
+        if self._thread is None:
+            self.start()
+        ticket = _Ticket(table if table is not None else HealthRecord.__table__, rows)
+        self._queue.put(ticket)
+        return ticket
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            nrows = len(batch[0].rows)
+            deadline = time.monotonic() + self.flush_interval
+
+            while nrows < self.max_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    ticket = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(ticket)
+                nrows += len(ticket.rows)
+
+            self._commit(batch, nrows)
+
+    def _commit(self, batch, nrows):
+        # Group rows per table so each table gets a single executemany
+        by_table = {}
+        for ticket in batch:
+            if ticket.rows:
+                by_table.setdefault(ticket.table, []).extend(ticket.rows)
+
+        start = time.perf_counter()
+        error = None
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    for table, rows in by_table.items():
+                        conn.execute(table.insert(), rows)
+        except Exception as e:
+            print(f"Group commit failed: {e}")
+            error = e
+        latency = time.perf_counter() - start
+
+        self._record(nrows, latency, error)
+        for ticket in batch:
+            ticket.error = error
+            ticket._done.set()
+
+    def _record(self, nrows, latency, error):
+        now = time.monotonic()
+        with self._stats_lock:
+            if error is not None:
+                self.total_errors += 1
+                return
+            self.total_rows += nrows
+            self.total_commits += 1
+            self.max_commit_latency = max(self.max_commit_latency, latency)
+            self._commits.append((now, nrows, latency))
+            while self._commits and now - self._commits[0][0] > self.stats_window:
+                self._commits.popleft()
+
+    def stats(self):
+        """Throughput and commit latency over the last `stats_window` seconds."""
+        now = time.monotonic()
+        with self._stats_lock:
+            recent = [c for c in self._commits if now - c[0] <= self.stats_window]
+            total_rows = self.total_rows
+            total_commits = self.total_commits
+            total_errors = self.total_errors
+            max_latency = self.max_commit_latency
+
+        rows = sum(c[1] for c in recent)
+        latencies = sorted(c[2] for c in recent)
+        return {
+            "rows_per_sec": rows / self.stats_window,
+            "commits_per_sec": len(recent) / self.stats_window,
+            "avg_rows_per_commit": (rows / len(recent)) if recent else 0.0,
+            "commit_latency_ms": {
+                "avg": (sum(latencies) / len(latencies) * 1000.0) if latencies else 0.0,
+                "p50": latencies[len(latencies) // 2] * 1000.0 if latencies else 0.0,
+                "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000.0 if latencies else 0.0,
+                "max": max_latency * 1000.0
+            },
+            "queue_depth": self.queue_depth(),
+            "total_rows": total_rows,
+            "total_commits": total_commits,
+            "total_errors": total_errors,
+            "flush_interval_ms": self.flush_interval * 1000.0,
+            "max_rows": self.max_rows
+        }
@@ -27,6 +27,10 @@ class User(UserMixin, db.Model):
         return check_password_hash(self.password_hash, password)
 
 class HealthRecord(db.Model):
+    __table_args__ = (
+        db.Index('ix_health_record_patient_time', 'patient_id', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.String(50), nullable=False) # Links to User.username or device_id
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
@@ -34,4 +38,25 @@ class HealthRecord(db.Model):
     spo2 = db.Column(db.Integer)
     temp = db.Column(db.Float)
     hum = db.Column(db.Float)
-    ecg_data = db.Column(db.Integer) # Storing single point for simplicity, or JSON for chunks
+    ecg_data = db.Column(db.Integer) # Legacy single point; new waveforms go to EcgChunk
+
+class EcgChunk(db.Model):
+    """
+    A fixed-length block of ECG samples for one patient.
+    Samples are delta + varint encoded (see dashboard/ecg_store.py), so a block
+    of a few hundred samples costs one row instead of one row per sample.
+    """
+    __table_args__ = (
+        db.Index('ix_ecg_chunk_patient_time', 'patient_id', 'start_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.String(50), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False) # Arrival time of the first sample
+    end_time = db.Column(db.DateTime, nullable=False) # Arrival time of the last sample
+    n_samples = db.Column(db.Integer, nullable=False)
+    encoding = db.Column(db.String(16), nullable=False, default='delta-varint')
+    samples = db.Column(db.LargeBinary, nullable=False)
+    # Block envelope, so long-range views can decimate without decoding samples
+    sample_min = db.Column(db.Integer)
+    sample_max = db.Column(db.Integer)
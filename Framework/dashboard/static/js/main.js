@@ -54,6 +54,8 @@ const ecgChart = new Chart(ctx, {
 
 // Socket.io Events
 socket.on('connect', () => {
+    // Only this patient's samples are sent to us
+    socket.emit('subscribe', { patient_id: PATIENT_ID });
     connectionStatus.textContent = 'Connected';
     connectionStatus.classList.remove('disconnected');
     connectionStatus.classList.add('connected');
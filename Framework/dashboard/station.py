@@ -0,0 +1,74 @@
+import threading
+import time
+
+# Fields the nurse station shows; the waveform is not needed for the ward summary
+SUMMARY_FIELDS = ('hr', 'spo2', 'temp', 'hum')
+
+
+class StationAggregator:
+    """
+    Keeps the latest vitals and last-seen time per patient in memory and emits
+    one `station_update` frame per tick, holding only the patients that changed.
+    Dashboard traffic is then bounded by the tick rate, not the sensor rate.
+
+    Frame: {"patients": {patient_id: {"data": {...}, "last_seen": t}}, "full": bool, "ts": t}
+    """
+    def __init__(self, socketio, room, rate_hz=2.0, event='station_update'):
+        self.socketio = socketio
+        self.room = room
+        self.interval = 1.0 / rate_hz
+        self.event = event
+
+        self._latest = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._started = False
+
+        self.frames_sent = 0
+
+    def update(self, patient_id, data, last_seen):
+        summary = {k: data[k] for k in SUMMARY_FIELDS if data.get(k) is not None}
+        with self._lock:
+            entry = self._latest.get(patient_id)
+            if entry is None:
+                entry = self._latest[patient_id] = {"data": {}, "last_seen": last_seen}
+            entry["data"].update(summary)
+            entry["last_seen"] = last_seen
+            self._dirty.add(patient_id)
+
+        if not self._started:
+            self.start()
+
+    def snapshot(self):
+        """Full ward state, sent to a station when it first subscribes."""
+        with self._lock:
+            patients = {pid: {"data": dict(e["data"]), "last_seen": e["last_seen"]}
+                        for pid, e in self._latest.items()}
+        return {"patients": patients, "full": True, "ts": time.time()}
+
+    def take_delta(self):
+        with self._lock:
+            if not self._dirty:
+                return None
+            patients = {pid: {"data": dict(self._latest[pid]["data"]), "last_seen": self._latest[pid]["last_seen"]}
+                        for pid in self._dirty}
+            self._dirty.clear()
+        return {"patients": patients, "full": False, "ts": time.time()}
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.interval)
+            try:
+                frame = self.take_delta()
+                if frame is not None:
+                    self.socketio.emit(self.event, frame, to=self.room)
+                    self.frames_sent += 1
+            except Exception as e:
+                print(f"Station update failed: {e}")
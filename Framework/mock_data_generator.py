@@ -1,10 +1,16 @@
+import argparse
 import requests
 import time
 import random
 import math
 import threading
+import queue
 
-SERVER_URL = "http://127.0.0.1:5000/data"
+import socketio
+
+SERVER_BASE = "http://127.0.0.1:5000"
+SERVER_URL = SERVER_BASE + "/data"
+DEVICE_NAMESPACE = "/device"
 
 def generate_ecg_point(t):
     """Simulates a basic ECG waveform"""
@@ -15,8 +21,136 @@ def generate_ecg_point(t):
     t_wave = 0.2 * math.exp(-((t % 1.0) - 0.7)**2 / 0.01)
     return (p_wave + q_wave + r_wave + s_wave + t_wave) * 500 + 512
 
-def simulate_patient(patient_id):
+class Counter:
+    """Readings acknowledged by the server, for throughput reporting."""
+    def __init__(self):
+        self.value = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def add(self, n=1):
+        with self._lock:
+            self.value += n
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+class HttpSender:
+    """One POST to /data per reading, over a pooled keep-alive session."""
+    def __init__(self, base_url, counter):
+        self.url = base_url + "/data"
+        self.counter = counter
+        self.session = requests.Session()
+
+    def send(self, payload):
+        try:
+            resp = self.session.post(self.url, json=payload)
+            if resp.status_code == 200:
+                self.counter.add()
+            else:
+                self.counter.error()
+        except Exception:
+            self.counter.error()
+
+    def close(self):
+        self.session.close()
+
+class DeviceChannel:
+    """
+    Streams readings over the server's /device Socket.IO namespace.
+    Readings are framed in batches of up to `batch_size` (or whatever arrived
+    within `linger` seconds), and at most `credit` frames are in flight; the
+    server adjusts the credit in each ack and answers "busy" when backed up.
+    send() blocks once `max_pending` readings are queued, so backpressure
+    reaches the producers instead of growing an unbounded buffer.
+    """
+    def __init__(self, base_url, counter, batch_size=20, linger=0.05, max_pending=1000):
+        self.counter = counter
+        self.batch_size = batch_size
+        self.linger = linger
+
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._credit = 1
+        self._seq = 0
+
+        self.sio = socketio.Client(reconnection=True)
+        self.sio.on('credit', self._on_credit, namespace=DEVICE_NAMESPACE)
+        self.sio.connect(base_url, namespaces=[DEVICE_NAMESPACE], transports=['websocket'])
+
+        threading.Thread(target=self._sender, daemon=True).start()
+
+    def send(self, payload):
+        self._pending.put(payload)
+
+    def close(self):
+        self.sio.disconnect()
+
+    def _on_credit(self, msg):
+        with self._cond:
+            self._credit = msg.get('credit', 1)
+            self._cond.notify_all()
+
+    def _next_frame(self):
+        readings = [self._pending.get()]
+        deadline = time.monotonic() + self.linger
+        while len(readings) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                readings.append(self._pending.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return readings
+
+    def _sender(self):
+        while True:
+            readings = self._next_frame()
+            with self._cond:
+                while self._in_flight >= self._credit:
+                    self._cond.wait()
+                self._in_flight += 1
+                self._seq += 1
+                seq = self._seq
+            self._emit(seq, readings)
+
+    def _emit(self, seq, readings):
+        frame = {"seq": seq, "readings": readings}
+        try:
+            self.sio.emit('readings', frame, namespace=DEVICE_NAMESPACE,
+                          callback=lambda ack: self._on_ack(ack, seq, readings))
+        except Exception:
+            self.counter.error()
+            self._release(1)
+
+    def _on_ack(self, ack, seq, readings):
+        ack = ack or {}
+        status = ack.get('status')
+        if status == 'success':
+            self.counter.add(ack.get('accepted', len(readings)))
+        elif status == 'busy':
+            # Keep the slot and resend the same frame once the server has drained
+            threading.Timer(ack.get('retry_after', 0.1), self._emit, args=(seq, readings)).start()
+            self._release(ack.get('credit', 1), keep_slot=True)
+            return
+        else:
+            self.counter.error()
+        self._release(ack.get('credit', self._credit))
+
+    def _release(self, credit, keep_slot=False):
+        with self._cond:
+            if not keep_slot:
+                self._in_flight -= 1
+            self._credit = credit
+            self._cond.notify_all()
+
+def simulate_patient(patient_id, sender=None, rate=10.0):
     print(f"Starting simulation for {patient_id}...")
+    if sender is None:
+        sender = HttpSender(SERVER_BASE, Counter())
     t = random.random() # Random start time offset
     while True:
         ecg = int(generate_ecg_point(t)) + random.randint(-10, 10)
@@ -34,23 +168,49 @@ def simulate_patient(patient_id):
             "hum": round(hum, 1)
         }
 
-        try:
-            requests.post(SERVER_URL, json=payload)
-        except Exception:
-            pass
+        sender.send(payload)
 
         t += 0.05
-        time.sleep(0.1)
+        if rate > 0:
+            time.sleep(1.0 / rate)
+
+def report(counter, interval=5.0):
+    last = 0
+    while True:
+        time.sleep(interval)
+        value = counter.value
+        print(f"{(value - last) / interval:.1f} readings/s acknowledged ({counter.errors} errors)")
+        last = value
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate bedside devices sending vitals")
+    parser.add_argument('--server', default=SERVER_BASE)
+    parser.add_argument('--transport', choices=['http', 'socket'], default='http',
+                        help="http: one POST per reading; socket: streamed frames on /device")
+    parser.add_argument('--patients', type=int, default=0,
+                        help="Number of simulated patients (default: the three demo patients)")
+    parser.add_argument('--rate', type=float, default=10.0, help="Readings per second per patient (0 = unthrottled)")
+    args = parser.parse_args()
+
     # Simulate 3 patients
     patients = ["patient_alpha", "patient_beta", "patient_gamma"]
-    
+    if args.patients:
+        patients = [f"patient_{i:04d}" for i in range(args.patients)]
+
+    counter = Counter()
+    if args.transport == 'socket':
+        channel = DeviceChannel(args.server, counter)
+        senders = {pid: channel for pid in patients}
+    else:
+        senders = {pid: HttpSender(args.server, counter) for pid in patients}
+
     threads = []
     for pid in patients:
-        thread = threading.Thread(target=simulate_patient, args=(pid,))
+        thread = threading.Thread(target=simulate_patient, args=(pid, senders[pid], args.rate))
         thread.start()
         threads.append(thread)
-        
+
+    threading.Thread(target=report, args=(counter,), daemon=True).start()
+
     for thread in threads:
         thread.join()
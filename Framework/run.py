@@ -1,7 +1,10 @@
 from dashboard.app import app, socketio, create_tables
+import multiprocessing
 import os
 
 if __name__ == '__main__':
+    # ABE crypto workers are child processes; needed for the frozen (PyInstaller) build
+    multiprocessing.freeze_support()
     print("Initializing Database...")
     create_tables()
     print("Starting MediSecure Dashboard...")